@@ -8,7 +8,18 @@ import vm from "vm";
 
 const binop = ["+", "-", "/", "%", "*", "**", "&", "|", ">>", ">>>", "<<", "^", "==", "===", "!=", "!==", "in", "instanceof", ">", "<", ">=", "<=", "|>"] as const;
 type BinaryOperator = (typeof binop)[number];
-const isBinaryOperator = (x: any): x is BinaryOperator => binop.includes(x);
+const binopSet: ReadonlySet<string> = new Set(binop);
+const isBinaryOperator = (x: any): x is BinaryOperator => binopSet.has(x);
+
+const reservedWords: ReadonlySet<string> = new Set([
+    "do", "if", "in", "for", "let", "new", "try", "var", "case", "else", "enum", "eval", "false",
+    "null", "this", "true", "void", "with", "break", "catch", "class", "const", "super", "throw",
+    "while", "yield", "delete", "export", "import", "public", "return", "static", "switch",
+    "typeof", "default", "extends", "finally", "package", "private", "continue", "debugger",
+    "function", "arguments", "interface", "protected", "implements", "instanceof"
+]);
+const identifierRegex = /^[$A-Z\_a-z]*$/;
+const isValidIdentifier = (x: string) => identifierRegex.test(x) && !reservedWords.has(x);
 
 class ObfuscatedStrings {
     /**
@@ -158,6 +169,7 @@ class DecryptStrings {
      */
     static decryptMapKeys(decyptFuncBinding: Binding, vmContext: vm.Context) {
         const references = decyptFuncBinding.referencePaths;
+        const callPaths: NodePath[] = [];
         for (const reference of references) {
             const refParentPath = reference.parentPath;
             if (!refParentPath) continue;
@@ -167,29 +179,43 @@ class DecryptStrings {
                 }
              */
             if (t.isReturnStatement(refParentPath.parent)) continue;
+            callPaths.push(refParentPath);
+        }
+        if (callPaths.length === 0) return;
 
+        // the same n(idx, "key") call is usually repeated many times,
+        // so decrypt every distinct call only once
+        const codeIndexes = new Map<string, number>();
+        const valueIndexes = callPaths.map((refParentPath) => {
             const code = generate(refParentPath.node).code;
-            const value = vm.runInContext(code, vmContext);
-            // console.log(`${code} -> ${value}`)
-            refParentPath.replaceWith(t.valueToNode(value));
-        }
+            let index = codeIndexes.get(code);
+            if (index === undefined) {
+                index = codeIndexes.size;
+                codeIndexes.set(code, index);
+            }
+            return index;
+        });
+
+        // evaluate all calls in one script instead of compiling a script per reference
+        const codes = [...codeIndexes.keys()];
+        const values = vm.runInContext(`[${codes.map((code) => `(${code})`).join(",")}]`, vmContext);
+        callPaths.forEach((refParentPath, i) => {
+            refParentPath.replaceWith(t.valueToNode(values[valueIndexes[i]]));
+        });
     }
 }
 
 enum MapFuncType {
-    CallOneArg,
-    CallThreeArg,
+    Call,
 }
 
 class MapReplacer {
-    decryptionMap: {
-        [key: string]: BinaryOperator | MapFuncType | string,
-    };
+    decryptionMap: Map<string, BinaryOperator | MapFuncType | string>;
     mapName: string | undefined;
     scope: Scope | undefined;
 
     constructor() {
-        this.decryptionMap = {};
+        this.decryptionMap = new Map();
     }
 
     /**
@@ -220,8 +246,10 @@ class MapReplacer {
         if (!t.isObjectExpression(node.init)) return;
         if (!t.isIdentifier(node.id)) return;
 
+        // collect entries first, the object only gets rewritten if it turns out to be the map
+        const entries = new Map<string, BinaryOperator | MapFuncType | string>();
         let flag = false;
-        node.init.properties = node.init.properties.filter((elemNode) => {
+        const properties = node.init.properties.filter((elemNode) => {
             if (!t.isObjectProperty(elemNode)) return true;
             if (!t.isIdentifier(elemNode.key)) return true;
             const key = elemNode.key.name;
@@ -230,6 +258,7 @@ class MapReplacer {
             // function(lhs, rhs) { lhs %-+ rhs }
             // function(inner, arg1, arg2, arg3) { inner(arg1, arg2, arg3) }
             // function(inner, arg1) { inner(arg1) }
+            // or a call wrapper of any other arity
             if (t.isFunctionExpression(elemNode.value)) {
                 let funcBody = elemNode.value.body.body;
                 if (funcBody.length !== 1) return true; // only one statement in function
@@ -237,19 +266,17 @@ class MapReplacer {
                 const ret = funcBody[0].argument;
 
                 if (t.isBinaryExpression(ret)) {
-                    this.decryptionMap[key] = ret.operator;
+                    entries.set(key, ret.operator);
                     flag = true; // should save map variable name and its scope
-                } else if (t.isCallExpression(ret)) {
-                    if (ret.arguments.length === 3) {
-                        this.decryptionMap[key] = MapFuncType.CallThreeArg;
-                    } else if (ret.arguments.length === 1) {
-                        this.decryptionMap[key] = MapFuncType.CallOneArg;
-                    }
+                } else if (t.isCallExpression(ret) && MapReplacer.isCallWrapper(elemNode.value, ret)) {
+                    entries.set(key, MapFuncType.Call);
+                } else {
+                    return true; // not a known wrapper, leave the property as is
                 }
             } else if (t.isStringLiteral(elemNode.value)) {
                 // tyrSs: "navigator.userAgent"
                 // save static strings for futher replacements in code
-                this.decryptionMap[key] = elemNode.value.value;
+                entries.set(key, elemNode.value.value);
             } else {
                 console.error(`Unknown value type occured in operations map: ${elemNode.value.type}`)
                 return true;
@@ -258,6 +285,8 @@ class MapReplacer {
         });
         
         if (flag) {
+            node.init.properties = properties;
+            entries.forEach((value, key) => this.decryptionMap.set(key, value));
             this.mapName = node.id.name;
             this.scope = path.scope;
             return flag;
@@ -265,67 +294,82 @@ class MapReplacer {
     }
 
     /**
-     * return Math.abs(c.YwyJj(c.yWlpb(...)))
+     * function(inner, arg1, ..., argN) { return inner(arg1, ..., argN) }
      */
-    public replaceBinaryOpCalls() {
-        this.scope?.traverse(this.scope.path.node, {
-            CallExpression(path: NodePath<t.CallExpression>) {
-                const node = path.node;
-                if (!t.isMemberExpression(node.callee)) return;
-
-                const {object, property} = node.callee;
-                if (!t.isIdentifier(object, {name: this.mapName})) return; // only if accessing functions in that map
-                if (!t.isStringLiteral(property)) return;
-
-                if (path.node.arguments.length !== 2) return; // only two arguments
-                // replace function call with respected binary operation
-                const op = this.decryptionMap[property.value];
-                if (!isBinaryOperator(op)) return;
-                let unObfNode = t.binaryExpression(op, node.arguments[0] as t.Expression, node.arguments[1] as t.Expression);
-                path.replaceWith(unObfNode);
-            }
-        }, this);
+    private static isCallWrapper(func: t.FunctionExpression, ret: t.CallExpression): boolean {
+        const [inner, ...params] = func.params;
+        if (!t.isIdentifier(inner) || !t.isIdentifier(ret.callee, {name: inner.name})) return false;
+        if (ret.arguments.length !== params.length) return false;
+        // arguments should be passed through as is, in the same order
+        return params.every((param, i) => t.isIdentifier(param) && t.isIdentifier(ret.arguments[i], {name: param.name}));
     }
 
-    public replaceMapIndexing() {
-        if (!this.mapName) return;
+    /**
+     * returns true if every use of the map was rewritten
+     */
+    public replaceMapUses(): boolean {
+        if (!this.mapName) return false;
         this.scope?.crawl(); // gather all references in this scope
         const references = this.scope?.getBinding(this.mapName)?.referencePaths;
         if (!references) {
             console.error("Map was found but has not been used further in the code")
-            return;
+            return true;
         }
-        for (const reference of references) {
-            const mapIndex = reference.parentPath;
-            const mapIndexParent = mapIndex?.parentPath;
-            if (!mapIndex || !t.isMemberExpression(mapIndex.node)) continue;
-            if (!mapIndexParent) continue;
-            const mapIndexParentNode = mapIndexParent.node;
+        let allReplaced = true;
+        // walk backwards so calls nested in arguments, e.g. c.YwyJj(c.yWlpb(...), ...),
+        // are rewritten before the call that contains them
+        for (let i = references.length - 1; i >= 0; i--) {
+            if (!this.replaceMapUse(references[i])) {
+                allReplaced = false;
+            }
+        }
+        return allReplaced;
+    }
 
-            const { object, computed, property } = mapIndex.node;
+    /**
+     * return Math.abs(c.YwyJj(c.yWlpb(...)))
+     * c.htzgw
+     * c.dOGlL(W, n)
+     */
+    private replaceMapUse(reference: NodePath): boolean {
+        const mapIndex = reference.parentPath;
+        const mapIndexParent = mapIndex?.parentPath;
+        if (!mapIndex || !t.isMemberExpression(mapIndex.node)) return false;
+        if (!mapIndexParent) return false;
+        const mapIndexParentNode = mapIndexParent.node;
 
-            if (object !== reference.node || !computed || !t.isStringLiteral(property)) {
-                continue;
-            }
+        const { object, computed, property } = mapIndex.node;
 
-            const mapVal = this.decryptionMap[property.value];
+        if (object !== reference.node || !computed || !t.isStringLiteral(property)) {
+            return false;
+        }
+
+        const mapVal = this.decryptionMap.get(property.value);
+        const isMapCall = t.isCallExpression(mapIndexParentNode) && mapIndexParentNode.callee === mapIndex.node;
 
+        if (isBinaryOperator(mapVal)) {
+            // replace function call with respected binary operation
+            if (!isMapCall || mapIndexParentNode.arguments.length !== 2) return false; // only two arguments
+            const args = mapIndexParentNode.arguments as t.Expression[];
+            mapIndexParent.replaceWith(t.binaryExpression(mapVal, args[0], args[1]));
+            return true;
+        } else if (typeof mapVal === 'string') {
             // replace map indexing with string value
-            if (typeof mapVal === 'string' && !isBinaryOperator(mapVal)) {
-                mapIndex.replaceWith(t.valueToNode(mapVal));
-            } else if (typeof mapVal !== 'string' && t.isCallExpression(mapIndexParentNode)) {
-                // replace function wrappers
-                // function(inner, arg1, arg2, arg3) { inner(arg1, arg2, arg3) }
-                // function(inner, arg1) { inner(arg1) }
-                if (mapIndexParentNode.arguments.length !== 0) {
-                    const func = mapIndexParentNode.arguments[0] as t.Expression;
-                    const args = mapIndexParentNode.arguments.slice(1);
-
-                    mapIndexParentNode.callee = func;
-                    mapIndexParentNode.arguments = args;
-                }
-            }
+            mapIndex.replaceWith(t.valueToNode(mapVal));
+            return true;
+        } else if (mapVal === MapFuncType.Call && isMapCall) {
+            // replace function wrappers
+            // function(inner, arg1, arg2, arg3) { inner(arg1, arg2, arg3) }
+            // function(inner, arg1) { inner(arg1) }
+            if (mapIndexParentNode.arguments.length === 0) return false;
+            const func = mapIndexParentNode.arguments[0] as t.Expression;
+            const args = mapIndexParentNode.arguments.slice(1);
+
+            mapIndexParentNode.callee = func;
+            mapIndexParentNode.arguments = args;
+            return true;
         }
+        return false;
     }
 }
 
@@ -336,7 +380,10 @@ class SimplifyIndexing {
         const node = path.node;
         if (!t.isCallExpression(path.node.callee)) return;
         if (node.arguments.length !== 3) return;
-        
+
+        // the replacement is skipped below, so convert indexing inside the arguments now
+        path.traverse({ MemberExpression: SimplifyIndexing.bracketToDot });
+
         const args = node.arguments as t.Expression[];
         const object = args[0];
         const property = args[1];
@@ -353,23 +400,46 @@ class SimplifyIndexing {
         path.skip();
     }
 
+    static bracketToDot(path: NodePath<t.MemberExpression>) {
+        let { object, property, computed } = path.node;
+        if (!computed) return; // Verify computed property is false
+        if (!t.isStringLiteral(property)) return; // Verify property is a string literal
+        if (!isValidIdentifier(property.value)) return; // Verify that the property being accessed is a valid identifier
+
+        // If conditions pass:
+
+        // Replace the node with a new one
+        path.replaceWith(
+            t.memberExpression(object, t.identifier(property.value), false)
+        );
+    }
+
     private static simplifyMultiPropery(object: t.Expression, property: t.Expression): t.Expression | undefined {
-        if (!t.isStringLiteral(property) || (t.isStringLiteral(property) && !property.value.includes("."))) {
+        if (!t.isStringLiteral(property)) {
             return t.memberExpression(object, property, true);
+        } else if (!property.value.includes(".")) {
+            return this.propertyAccess(object, property.value);
         } else {
             const properties = property.value.split(".");
             let resultObj;
             for (const prop of properties) {
-                const propLit = t.stringLiteral(prop);
                 if (!resultObj) {
-                    resultObj = t.memberExpression(object, propLit, true);
+                    resultObj = this.propertyAccess(object, prop);
                 } else {
-                    resultObj = t.memberExpression(resultObj, propLit, true);
+                    resultObj = this.propertyAccess(resultObj, prop);
                 }
             }
             return resultObj;
         }
     }
+
+    // object.prop if prop is a valid identifier, object["prop"] otherwise
+    private static propertyAccess(object: t.Expression, prop: string): t.MemberExpression {
+        if (isValidIdentifier(prop)) {
+            return t.memberExpression(object, t.identifier(prop), false);
+        }
+        return t.memberExpression(object, t.stringLiteral(prop), true);
+    }
 }
 
 /**
@@ -408,40 +478,8 @@ function deobfuscate(source: string) {
     }
 
     const parseDecryptFunctions = {
-        /**
-        (n.A = (W) => {
-          const c = {
-              YwyJj: function (W, n) {
-                return W + n;
-              },
-              ...
-              htzgw: n(588, "**Ox"),
-              ...
-            }
-          function n(W, n) {
-            return f(W - 246, n);
-            }
-         */
-        ArrowFunctionExpression(arrowFuncPath: NodePath<t.ArrowFunctionExpression>) {
-            arrowFuncPath.traverse({
-                FunctionDeclaration(path) {
-                    if (!firstDecryptFuncBinding && baseDecryptFunc) {
-                        const binding = ObfuscatedStrings.findDecryptFunction(path, decryptCtx, baseDecryptFunc);
-                        if (binding) {
-                            firstDecryptFuncBinding = binding;
-                        }
-                    } else if (!secondDecryptFuncBinding && firstDecryptFuncBinding) {
-                        const binding = ObfuscatedStrings.findDecryptFunction(path, decryptCtx, firstDecryptFuncBinding.identifier.name);
-                        if (binding) {
-                            secondDecryptFuncBinding = binding;
-                        }
-                    }
-                }
-            })
-        },
-
         FunctionDeclaration(path: NodePath<t.FunctionDeclaration>) {
-            if (funcObfStrings) {
+            if (funcObfStrings && !baseDecryptFunc) {
                 const funcName = ObfuscatedStrings.findBaseDecryptFunction(path, decryptCtx, funcObfStrings);
 
                 if (funcName) {
@@ -449,10 +487,40 @@ function deobfuscate(source: string) {
                     return;
                 }
             }
+
+            /**
+            (n.A = (W) => {
+              const c = {
+                  YwyJj: function (W, n) {
+                    return W + n;
+                  },
+                  ...
+                  htzgw: n(588, "**Ox"),
+                  ...
+                }
+              function n(W, n) {
+                return f(W - 246, n);
+                }
+             */
+            // both functions are found, no need to check the rest of the declarations
+            if (secondDecryptFuncBinding) return;
+            if (!path.findParent((parent) => parent.isArrowFunctionExpression())) return;
+
+            if (!firstDecryptFuncBinding && baseDecryptFunc) {
+                const binding = ObfuscatedStrings.findDecryptFunction(path, decryptCtx, baseDecryptFunc);
+                if (binding) {
+                    firstDecryptFuncBinding = binding;
+                }
+            } else if (firstDecryptFuncBinding) {
+                const binding = ObfuscatedStrings.findDecryptFunction(path, decryptCtx, firstDecryptFuncBinding.identifier.name);
+                if (binding) {
+                    secondDecryptFuncBinding = binding;
+                }
+            }
         },
 
         CallExpression(path: NodePath<t.CallExpression>) {
-            if (!funcObfStrings) return;
+            if (!funcObfStrings || foundShuffleFunc) return;
 
             if (ObfuscatedStrings.shuffleObfuscatedStrings(path, decryptCtx, funcObfStrings)) {
                 foundShuffleFunc = true;
@@ -477,46 +545,31 @@ function deobfuscate(source: string) {
             const scope = mapReplacer.parseMap(path);
             if (!scope) return;
 
-            mapReplacer.replaceBinaryOpCalls();
-
-            mapReplacer.replaceMapIndexing();
+            const allReplaced = mapReplacer.replaceMapUses();
 
             path.stop();
-            path.remove();
+            // keep the map if anything left in the code can still refer to it
+            if (allReplaced && t.isObjectExpression(path.node.init) && path.node.init.properties.length === 0) {
+                path.remove();
+            }
         }
     };
 
     traverse(ast, processMap);
 
-    const simplifyUnwrapOrElseExpr = {
+    const simplifyExpressions = {
         CallExpression(path: NodePath<t.CallExpression>) {
             // u is a decorator kinda `unwrapOrElse()(target, default)`,
             // which can be expressed in JS via ||
             SimplifyIndexing.simplifyUnwrapOrElse(path);
-          },
-    };
-
-    traverse(ast, simplifyUnwrapOrElseExpr);
-
-    const validIdentifierRegex = /^(?!(?:do|if|in|for|let|new|try|var|case|else|enum|eval|false|null|this|true|void|with|break|catch|class|const|super|throw|while|yield|delete|export|import|public|return|static|switch|typeof|default|extends|finally|package|private|continue|debugger|function|arguments|interface|protected|implements|instanceof)$)[$A-Z\_a-z]*$/;
+        },
 
-    const bracketToDot = {
         MemberExpression(path: NodePath<t.MemberExpression>) {
-            let { object, property, computed } = path.node;
-            if (!computed) return; // Verify computed property is false
-            if (!t.isStringLiteral(property)) return; // Verify property is a string literal
-            if (!validIdentifierRegex.test(property.value)) return; // Verify that the property being accessed is a valid identifier
-
-            // If conditions pass:
-
-            // Replace the node with a new one
-            path.replaceWith(
-                t.memberExpression(object, t.identifier(property.value), false)
-            );
+            SimplifyIndexing.bracketToDot(path);
         },
     };
 
-    traverse(ast, bracketToDot);
+    traverse(ast, simplifyExpressions);
 
     // Code Beautification
     let deobfCode = generate(ast, {
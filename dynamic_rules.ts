@@ -33,6 +33,8 @@ interface DynamicRules {
     checksum_constant: number
 }
 
+const hexRegex = /^[0-9a-fA-F]+$/;
+
 function getRules(ast: t.Node): DynamicRules | undefined {
     let staticParam: string | undefined;
     let checksumConstant: number = 0;
@@ -40,7 +42,9 @@ function getRules(ast: t.Node): DynamicRules | undefined {
     let prefix: string | undefined;
     let suffix: string | undefined;
 
+    // both visitors run in the same pass; scopes are never used, so don't build them
     traverse(ast, {
+        noScope: true,
         ArrayExpression(path) {
             const elements = path.node.elements;
             if (!t.isStringLiteral(elements[0])) return;
@@ -53,7 +57,7 @@ function getRules(ast: t.Node): DynamicRules | undefined {
             }
 
             const lastElem = elements.slice(-1)[0];
-            if (t.isStringLiteral(lastElem) && !isNaN(parseInt(lastElem.value, 16))) {
+            if (t.isStringLiteral(lastElem) && hexRegex.test(lastElem.value)) {
                 suffix = lastElem.value;
             }
         },